@@ -1,11 +1,108 @@
 import RPi.GPIO as GPIO
+import os
 import time
 import curses
+import queue
+import threading
+
+# pigpio is optional: when its daemon (pigpiod) is running, tones are timed by
+# the Pi's PWM/DMA hardware instead of RPi.GPIO's software PWM thread.
+try:
+    import pigpio
+except ImportError:
+    pigpio = None
 
 # This script has a dual purpose:
 # 1. It can be IMPORTED by other scripts to use the BuzzerController class.
 # 2. It can be RUN DIRECTLY to launch a full-featured interactive music toy.
 
+class _RPiGPIOTone:
+    """Square-wave tone output using RPi.GPIO software PWM."""
+
+    def __init__(self, pin):
+        self.pin = pin
+        # The calling script is responsible for GPIO.setmode().
+        GPIO.setup(self.pin, GPIO.OUT)
+        self.pwm = GPIO.PWM(self.pin, 100)
+        self.pwm.start(0)
+        # Last values written to the PWM, used to skip redundant register writes
+        self._last_freq = 100
+        self._sounding = False
+
+    def set_tone(self, frequency):
+        """Sounds `frequency` Hz at 50% duty, or silences the pin for 0."""
+        if frequency > 0:
+            if frequency != self._last_freq:
+                self.pwm.ChangeFrequency(frequency)
+                self._last_freq = frequency
+            if not self._sounding:
+                self.pwm.ChangeDutyCycle(50)
+                self._sounding = True
+        elif self._sounding:
+            self.pwm.ChangeDutyCycle(0)
+            self._sounding = False
+
+    def stop(self):
+        self.pwm.stop()
+
+class _PigpioTone:
+    """
+    Square-wave tone output generated by hardware through pigpio. The hardware
+    PWM pins get a true hardware PWM; any other pin plays a repeating DMA
+    waveform with microsecond timing.
+    """
+
+    HARDWARE_PWM_PINS = (12, 13, 18, 19)
+
+    def __init__(self, pi, pin):
+        self.pi = pi
+        self.pin = pin
+        self.pi.set_mode(self.pin, pigpio.OUTPUT)
+        self.pi.write(self.pin, 0)
+        self._hardware = self.pin in self.HARDWARE_PWM_PINS
+        self._wave_id = None
+        self._wave_freq = 0
+        self._last_freq = 0
+
+    def set_tone(self, frequency):
+        """Sounds `frequency` Hz at 50% duty, or silences the pin for 0."""
+        if frequency == self._last_freq:
+            return
+        self._last_freq = frequency
+        if self._hardware:
+            # hardware_PWM duty is in millionths; 0 Hz switches the output off
+            if frequency > 0:
+                self.pi.hardware_PWM(self.pin, int(round(frequency)), 500000)
+            else:
+                self.pi.hardware_PWM(self.pin, 0, 0)
+            return
+
+        if frequency == 0:
+            # Keep the wave: the next note is often the same and can resend it
+            self.pi.wave_tx_stop()
+            self.pi.write(self.pin, 0)
+            return
+        if frequency == self._wave_freq:
+            self.pi.wave_send_repeat(self._wave_id)
+            return
+        old_wave_id = self._wave_id
+        half_period_us = max(1, int(round(500000 / frequency)))
+        self.pi.wave_add_generic([
+            pigpio.pulse(1 << self.pin, 0, half_period_us),
+            pigpio.pulse(0, 1 << self.pin, half_period_us),
+        ])
+        self._wave_id = self.pi.wave_create()
+        self._wave_freq = frequency
+        self.pi.wave_send_repeat(self._wave_id)
+        if old_wave_id is not None:
+            self.pi.wave_delete(old_wave_id)
+
+    def stop(self):
+        self.set_tone(0)
+        if self._wave_id is not None:
+            self.pi.wave_delete(self._wave_id)
+        self.pi.stop()
+
 class BuzzerController:
     """A controller class for the buzzer, handling note generation and playback."""
     
@@ -15,31 +112,139 @@ class BuzzerController:
         'C6': 1046.50, 'D6': 1174.66, 'E6': 1318.51, 'F6': 1396.91, 'G6': 1567.98, 'A6': 1760.00, 'B6': 1975.53,
     }
 
-    def __init__(self, pin=23):
+    # Share of a note pair's duration given to the leading harmony (grace) note
+    HARMONY_FRACTION = 0.25
+
+    # If a note is requested this long (in seconds) after the previous one should
+    # have ended, the caller was idle and timing starts over from "now".
+    RESYNC_THRESHOLD = 0.05
+
+    # Final stretch (in seconds) of each note that the sleep fallback busy-waits
+    SPIN_SLACK = 0.0015
+
+    def __init__(self, pin=23, use_pigpio=True):
         self.pin = pin
-        # The class now ALWAYS sets up its own pin as an output.
-        # The calling script is responsible for GPIO.setmode().
-        GPIO.setup(self.pin, GPIO.OUT)
-        
-        self.pwm = GPIO.PWM(self.pin, 100)
-        self.pwm.start(0)
+        # The class now ALWAYS sets up its own pin as an output, preferring
+        # hardware-timed pigpio and falling back to RPi.GPIO software PWM.
+        self._tone = None
+        if use_pigpio and pigpio is not None:
+            pi = pigpio.pi()
+            if pi.connected:
+                self._tone = _PigpioTone(pi, self.pin)
+        if self._tone is None:
+            self._tone = _RPiGPIOTone(self.pin)
 
-    def play_note(self, note, duration):
-        frequency = self.NOTES.get(note, 0)
-        if frequency > 0:
-            self.pwm.ChangeFrequency(frequency)
-            self.pwm.ChangeDutyCycle(50)
-            time.sleep(duration)
-            self.pwm.ChangeDutyCycle(0)
+        # Note boundaries are timed against absolute deadlines on the monotonic
+        # clock so that a melody does not drift. A timerfd (Python 3.13+) gives
+        # a precise wakeup; older interpreters fall back to time.sleep().
+        self._tfd = None
+        if hasattr(os, 'timerfd_create'):
+            self._tfd = os.timerfd_create(time.CLOCK_MONOTONIC, 0)
+        self._next_deadline = None
+
+        # PWM register writes happen on a dedicated playback thread so callers
+        # only queue notes and never stall on GPIO calls mid-sequence.
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._worker = threading.Thread(target=self._playback_worker)
+        self._worker.daemon = True
+        self._worker.start()
+
+    def _wait_until(self, deadline):
+        """Blocks until the absolute CLOCK_MONOTONIC time `deadline`."""
+        if self._tfd is not None:
+            os.timerfd_settime(self._tfd, flags=os.TFD_TIMER_ABSTIME, initial=deadline)
+            os.read(self._tfd, 8)
         else:
-            time.sleep(duration)
+            self._precise_wait(deadline)
+
+    def _precise_wait(self, deadline):
+        """
+        Fallback for _wait_until without timerfd: sleeps until SPIN_SLACK before
+        the deadline, then busy-waits the rest. This costs up to SPIN_SLACK of
+        full CPU per note but removes time.sleep() oversleep from short notes.
+        """
+        target_ns = int(deadline * 1e9)
+        remaining = deadline - time.clock_gettime(time.CLOCK_MONOTONIC)
+        if remaining > self.SPIN_SLACK:
+            time.sleep(remaining - self.SPIN_SLACK)
+        while time.clock_gettime_ns(time.CLOCK_MONOTONIC) < target_ns:
+            pass
+
+    def _next_note_deadline(self, duration):
+        now = time.clock_gettime(time.CLOCK_MONOTONIC)
+        # Re-seed when starting fresh or after an idle gap (e.g. waiting for input)
+        if self._next_deadline is None or now - self._next_deadline > self.RESYNC_THRESHOLD:
+            self._next_deadline = now
+        self._next_deadline += duration
+        return self._next_deadline
+
+    def _playback_worker(self):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                # Nothing else queued: silence the buzzer while idle
+                self._tone.set_tone(0)
+                item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                frequencies, durations = item
+                for i in range(len(frequencies)):
+                    if self._stop_event.is_set(): break
+                    self._play_hz_now(frequencies[i], durations[i])
+            finally:
+                self._queue.task_done()
+
+    def _play_hz_now(self, frequency, duration):
+        deadline = self._next_note_deadline(duration)
+        self._tone.set_tone(frequency)
+        self._wait_until(deadline)
+        # Silence at the end of every note so repeated notes stay separate
+        # (only --legato merges them); rests are already silent.
+        if frequency > 0:
+            self._tone.set_tone(0)
+
+    def play_hz(self, frequency, duration):
+        """Queues a raw frequency (0 for a rest) and returns immediately."""
+        self._queue.put(((frequency,), (duration,)))
+
+    def play_sequence(self, frequencies, durations):
+        """
+        Queues a whole melody as two parallel flat arrays (Hz, 0 for a rest,
+        and seconds) and returns immediately. The worker walks them by index.
+        """
+        self._queue.put((frequencies, durations))
+
+    def play_note(self, note, duration):
+        """Queues a named note for playback and returns immediately."""
+        self.play_hz(self.NOTES.get(note, 0), duration)
+
+    def flush(self):
+        """Blocks until every queued note has finished playing."""
+        self._queue.join()
 
-    def play_note_pair(self, harmony_note, melody_note, total_duration=0.4):
-        self.play_note(harmony_note, total_duration * 0.25)
-        self.play_note(melody_note, total_duration * 0.75)
+    def play_note_pair(self, harmony_hz, melody_hz, total_duration=0.4):
+        # Takes frequencies already resolved from NOTES (see ninja_japanese)
+        harmony_duration = total_duration * self.HARMONY_FRACTION
+        self.play_sequence((harmony_hz, melody_hz), (harmony_duration, total_duration - harmony_duration))
 
     def cleanup(self):
-        self.pwm.stop()
+        # Drop anything still queued so an interrupted melody stops right away
+        self._stop_event.set()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+        self._queue.put(None)
+        self._worker.join(timeout=1.0)
+        self._tone.stop()
+        if self._tfd is not None:
+            os.close(self._tfd)
+            self._tfd = None
         # The class does not call GPIO.cleanup(), the main script does.
         # This allows multiple controllers to be used without conflict.
 
@@ -96,23 +301,27 @@ if __name__ == "__main__":
         # The main interactive function creates the buzzer instance.
         # The `setup_gpio=False` argument has been removed.
         buzzer = BuzzerController(pin=23)
-        while True:
-            draw_main_screen(stdscr)
-            curses.echo()
-            cmd = stdscr.getstr(4, 7).decode('utf-8').strip()
-            curses.noecho()
-
-            if cmd.lower() == 'quit': break
-            if cmd.lower() == 'help':
-                draw_help_screen(stdscr)
-                continue
-            if cmd.lower() == 'live':
-                live_play_mode(stdscr, buzzer)
-                continue
-            
-            notes = cmd.split(',')
-            for note in notes:
-                buzzer.play_note(note.strip(), 0.3)
+        try:
+            while True:
+                draw_main_screen(stdscr)
+                curses.echo()
+                cmd = stdscr.getstr(4, 7).decode('utf-8').strip()
+                curses.noecho()
+
+                if cmd.lower() == 'quit': break
+                if cmd.lower() == 'help':
+                    draw_help_screen(stdscr)
+                    continue
+                if cmd.lower() == 'live':
+                    live_play_mode(stdscr, buzzer)
+                    continue
+                
+                notes = cmd.split(',')
+                for note in notes:
+                    buzzer.play_note(note.strip(), 0.3)
+                buzzer.flush()
+        finally:
+            buzzer.cleanup()
 
     # Setup and run the curses application
     try:
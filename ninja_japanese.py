@@ -1,4 +1,6 @@
 from ninja_buzzer import BuzzerController
+import array
+import functools
 import time
 import re
 import RPi.GPIO as GPIO
@@ -15,17 +17,24 @@ NOTE_DURATIONS = {
     "eighth": QUARTER_NOTE_DURATION / 2,
     "sixteenth": QUARTER_NOTE_DURATION / 4, # Added for more precise rests
 }
+# Reverse lookup used when printing a translation. Durations come straight from
+# NOTE_DURATIONS (never from arithmetic), so the float keys match exactly.
+DURATION_TO_NAME = {v: k for k, v in NOTE_DURATIONS.items()}
 # --- UPDATED: Changed rest duration between words ---
 # The rest is now a "quarter rest" in name, but corresponds to a 16th note in duration (~0.125s)
 # to match the requested timing.
 INTER_WORD_REST_DURATION = NOTE_DURATIONS["sixteenth"]
 
+# --- Output ---
+# When False, the note-by-note translation is not printed. Toggle at the prompt with 'verbose on/off'.
+VERBOSE = False
+
 # --- Redefined Mood Templates ---
 MOOD_TEMPLATES = {
-    "happy": ["quarter"],
-    "sad": ["whole"],
-    "excited": ["eighth"],
-    "angry": ["half"],
+    "happy": ("quarter",),
+    "sad": ("whole",),
+    "excited": ("eighth",),
+    "angry": ("half",),
 }
 DEFAULT_RHYTHM = MOOD_TEMPLATES["happy"]
 
@@ -41,51 +50,173 @@ HIRAGANA_MAP = {
 }
 ALL_HIRAGANA = "".join(HIRAGANA_MAP.keys())
 
+# Regexes compiled once at import. WORD_SPLIT_RE keeps the separators as parts.
+# It enumerates the supported characters instead of using the whole hiragana block,
+# so unsupported kana (e.g. が, ゃ) still act as separators rather than reaching the translator.
+WORD_SPLIT_RE = re.compile(f'([^{ALL_HIRAGANA}]+)')
+MOOD_RE = re.compile(r'--mood\s+(\w+)')
+CUSTOM_RHYTHM_RE = re.compile(r'\[(.*?)\]')
+LEGATO_RE = re.compile(r'--legato\b')
+
+# Frequencies resolved once up front so playback never looks up note names
+VOWEL_HZ = {v: BuzzerController.NOTES[note] for v, note in VOWEL_NOTE_MAP.items()}
+CONSONANT_HZ = {c: BuzzerController.NOTES[note] for c, note in CONSONANT_NOTE_MAP.items()}
+
+# Each hiragana resolved once to ((harmony_hz, melody_hz), (harmony_note, melody_note)),
+# so translation does a single lookup per character. 'ん' maps to None, the
+# sentinel for "repeat the previous mora".
+MORA_TABLE = {
+    char: (
+        (CONSONANT_HZ.get(consonant_group, 0), VOWEL_HZ.get(vowel, 0)),
+        (CONSONANT_NOTE_MAP.get(consonant_group, 'P'), VOWEL_NOTE_MAP.get(vowel, 'P')),
+    )
+    for char, (consonant_group, vowel) in HIRAGANA_MAP.items()
+}
+MORA_TABLE['ん'] = None
+
 # ========== 2. TRANSLATION & PARSING LOGIC (Unchanged) ==========
 
 def translate_word_to_music(hiragana_word, rhythm_pattern):
+    """
+    Translates one hiragana word into music.
+    Returns two parallel lists of (pair, seconds): one with frequencies in Hz
+    for playback, and one with note names for display.
+    """
     music_sequence = []
-    last_pair_and_duration = (('P', 'P'), NOTE_DURATIONS["quarter"])
+    symbolic_sequence = []
+    last_hz_data = ((0, 0), NOTE_DURATIONS["quarter"])
+    last_symbolic_data = (('P', 'P'), NOTE_DURATIONS["quarter"])
     mora_index = 0
+    # Resolve the rhythm to seconds once rather than per mora
+    rhythm_secs = [NOTE_DURATIONS.get(name, QUARTER_NOTE_DURATION) for name in rhythm_pattern]
+    rhythm_len = len(rhythm_secs)
     for char in hiragana_word:
-        if char == 'ん':
-            music_sequence.append(last_pair_and_duration)
+        mora = MORA_TABLE[char]
+        if mora is None:
+            music_sequence.append(last_hz_data)
+            symbolic_sequence.append(last_symbolic_data)
             mora_index += 1
             continue
-        duration_name = rhythm_pattern[mora_index % len(rhythm_pattern)]
-        duration_sec = NOTE_DURATIONS.get(duration_name, QUARTER_NOTE_DURATION)
-        consonant_group, vowel = HIRAGANA_MAP[char]
-        harmony_note = CONSONANT_NOTE_MAP.get(consonant_group, 'P')
-        melody_note = VOWEL_NOTE_MAP.get(vowel, 'P')
-        current_data = ((harmony_note, melody_note), duration_sec)
-        music_sequence.append(current_data)
-        last_pair_and_duration = current_data
+        duration_sec = rhythm_secs[mora_index % rhythm_len]
+        hz_pair, note_pair = mora
+        last_hz_data = (hz_pair, duration_sec)
+        last_symbolic_data = (note_pair, duration_sec)
+        music_sequence.append(last_hz_data)
+        symbolic_sequence.append(last_symbolic_data)
         mora_index += 1
-    return music_sequence
+    return music_sequence, symbolic_sequence
+
+@functools.lru_cache(maxsize=256)
+def translate_text_to_music(hiragana_text, rhythm_pattern):
+    """
+    Translates a whole line or paragraph: splits it into words on any
+    non-hiragana characters, translates each word and puts a short rest
+    between words. Returns the same two parallel sequences as
+    translate_word_to_music, as tuples since results are cached and shared.
+    rhythm_pattern must be a tuple.
+    """
+    music_sequence = []
+    symbolic_sequence = []
+    is_first_part = True
+    for part in WORD_SPLIT_RE.split(hiragana_text):
+        if not part: continue
+
+        if part[0] in ALL_HIRAGANA:
+            word_sequence, word_symbols = translate_word_to_music(part, rhythm_pattern)
+            music_sequence.extend(word_sequence)
+            symbolic_sequence.extend(word_symbols)
+        elif not is_first_part:
+            # Use the new, shorter quarter-rest duration
+            music_sequence.append(((0, 0), INTER_WORD_REST_DURATION))
+            symbolic_sequence.append((('P', 'P'), INTER_WORD_REST_DURATION))
+
+        is_first_part = False
+    return tuple(music_sequence), tuple(symbolic_sequence)
+
+def coalesce_repeated_pairs(symbolic_sequence):
+    """
+    Legato, for display: merges back-to-back identical (harmony, melody) note
+    pairs of a symbolic sequence into one longer entry. Rests are never merged,
+    to keep the intended phrasing. Playback is merged by flatten_for_playback().
+    """
+    merged_symbols = []
+    for note_pair, duration in symbolic_sequence:
+        if merged_symbols and note_pair != ('P', 'P') and merged_symbols[-1][0] == note_pair:
+            merged_symbols[-1] = (note_pair, merged_symbols[-1][1] + duration)
+        else:
+            merged_symbols.append((note_pair, duration))
+    return merged_symbols
+
+def flatten_for_playback(music_sequence, legato=False):
+    """
+    Flattens ((harmony_hz, melody_hz), seconds) pairs into two parallel arrays
+    of frequencies and durations (harmony then melody for each pair), ready for
+    BuzzerController.play_sequence().
+    With legato, a pair identical to the one before it (rests excepted) only
+    lengthens that pair's melody note, so the two sound as one sustained tone
+    and the harmony grace note keeps its original length.
+    """
+    frequencies = array.array('d')
+    durations = array.array('d')
+    harmony_fraction = BuzzerController.HARMONY_FRACTION
+    last_pair = None
+    for pair, duration in music_sequence:
+        if legato and pair == last_pair and pair != (0, 0):
+            durations[-1] += duration
+            continue
+        harmony_hz, melody_hz = last_pair = pair
+        harmony_duration = duration * harmony_fraction
+        frequencies.append(harmony_hz)
+        frequencies.append(melody_hz)
+        durations.append(harmony_duration)
+        durations.append(duration - harmony_duration)
+    return frequencies, durations
+
+@functools.lru_cache(maxsize=64)
+def parse_custom_rhythm(rhythm_str):
+    """Parses 'whole,half' into a tuple of duration names, or None if any name is unknown."""
+    custom_rhythm = tuple(r.strip() for r in rhythm_str.split(','))
+    if all(r in NOTE_DURATIONS for r in custom_rhythm):
+        return custom_rhythm
+    return None
 
 def parse_input(user_input):
+    """Splits user input into (hiragana_text, rhythm_pattern, legato) and reports the options used."""
+    text, rhythm, legato, messages = _parse_input_cached(user_input)
+    for message in messages:
+        print(message)
+    return text, rhythm, legato
+
+@functools.lru_cache(maxsize=256)
+def _parse_input_cached(user_input):
+    # Pure part of parse_input, cached so repeated phrases skip the regex work.
+    # Messages are returned rather than printed so they still appear on a cache hit.
     text = user_input
     rhythm = DEFAULT_RHYTHM
-    mood_match = re.search(r'--mood\s+(\w+)', text)
+    legato = False
+    messages = []
+    if LEGATO_RE.search(text):
+        legato = True
+        text = LEGATO_RE.sub('', text).strip()
+    mood_match = MOOD_RE.search(text)
     if mood_match:
         mood = mood_match.group(1).lower()
         if mood in MOOD_TEMPLATES:
             rhythm = MOOD_TEMPLATES[mood]
-            print(f"Info: Using '{mood}' mood rhythm.")
+            messages.append(f"Info: Using '{mood}' mood rhythm.")
         else:
-            print(f"Warning: Mood '{mood}' not found. Using default 'happy' rhythm.")
-        text = re.sub(r'--mood\s+\w+', '', text).strip()
-    custom_rhythm_match = re.search(r'\[(.*?)\]', text)
+            messages.append(f"Warning: Mood '{mood}' not found. Using default 'happy' rhythm.")
+        text = MOOD_RE.sub('', text).strip()
+    custom_rhythm_match = CUSTOM_RHYTHM_RE.search(text)
     if custom_rhythm_match:
-        rhythm_str = custom_rhythm_match.group(1)
-        custom_rhythm = [r.strip() for r in rhythm_str.split(',')]
-        if all(r in NOTE_DURATIONS for r in custom_rhythm):
+        custom_rhythm = parse_custom_rhythm(custom_rhythm_match.group(1))
+        if custom_rhythm is not None:
             rhythm = custom_rhythm
-            print("Info: Using custom rhythm.")
+            messages.append("Info: Using custom rhythm.")
         else:
-            print("Warning: Invalid custom rhythm. Using default.")
-        text = re.sub(r'\[.*?\]', '', text).strip()
-    return text, rhythm
+            messages.append("Warning: Invalid custom rhythm. Using default.")
+        text = CUSTOM_RHYTHM_RE.sub('', text).strip()
+    return text, rhythm, legato, tuple(messages)
 
 def show_help():
     """Displays the help guide with updated rest information."""
@@ -120,7 +251,12 @@ Provide a comma-separated list of durations in square brackets.
 Available Durations:
   - whole, half, quarter, eighth, sixteenth
 
+**LEGATO**
+Add '--legato' to merge repeated notes into one sustained tone.
+> こんにちは --legato
+
 **OTHER COMMANDS**
+  - verbose on/off: Show or hide the note-by-note translation (default: off).
   - help: Shows this help message.
   - quit: Exits the program.
 """
@@ -129,6 +265,7 @@ Available Durations:
 # ========== 3. MAIN APPLICATION (Updated Rest Logic) ==========
 
 def main():
+    global VERBOSE
     GPIO.setwarnings(False)
     GPIO.setmode(GPIO.BCM)
     buzzer = BuzzerController()
@@ -145,49 +282,40 @@ def main():
             if user_input.lower() == 'help':
                 show_help()
                 continue
+            if user_input.lower() in ('verbose on', 'verbose off'):
+                VERBOSE = user_input.lower() == 'verbose on'
+                print(f"Verbose translation output {'enabled' if VERBOSE else 'disabled'}.")
+                continue
 
-            hiragana_text, rhythm_pattern = parse_input(user_input)
-            
-            parts = re.split(f'([^{ALL_HIRAGANA}]+)', hiragana_text)
+            hiragana_text, rhythm_pattern, legato = parse_input(user_input)
             
-            full_music_sequence = []
-            is_first_part = True
-            for part in parts:
-                if not part: continue
-
-                if part[0] in ALL_HIRAGANA:
-                    word_sequence = translate_word_to_music(part, rhythm_pattern)
-                    full_music_sequence.extend(word_sequence)
-                elif not is_first_part:
-                    # Use the new, shorter quarter-rest duration
-                    full_music_sequence.append((('P', 'P'), INTER_WORD_REST_DURATION))
-                
-                is_first_part = False
+            full_music_sequence, full_symbolic_sequence = translate_text_to_music(hiragana_text, rhythm_pattern)
 
             if not full_music_sequence:
                 print("No valid hiragana found in input.")
                 continue
 
-            # Create a readable version of the sequence for printing
-            # This part is a bit complex but makes the output user-friendly
-            duration_to_name = {v: k for k, v in NOTE_DURATIONS.items()}
-            printable_sequence = []
-            for (pair, sec) in full_music_sequence:
-                # Find the closest duration name for printing
-                duration_name = duration_to_name.get(sec, f"{sec:.3f}s")
-                printable_sequence.append((pair, duration_name))
+            if legato:
+                full_symbolic_sequence = coalesce_repeated_pairs(full_symbolic_sequence)
 
-            print(f"Translation: {printable_sequence}")
-            
             print("Playing...")
-            for (harmony, melody), duration in full_music_sequence:
-                buzzer.play_note_pair(harmony, melody, total_duration=duration)
+            # Queue the melody first; the buzzer plays it on its own thread, so
+            # building and printing the translation below never delays the first note.
+            buzzer.play_sequence(*flatten_for_playback(full_music_sequence, legato))
+
+            if VERBOSE:
+                # Create a readable version of the sequence for printing
+                printable_sequence = [(pair, DURATION_TO_NAME.get(sec, f"{sec:.3f}s")) for pair, sec in full_symbolic_sequence]
+                print(f"Translation: {printable_sequence}")
+
+            buzzer.flush()
             print("Playback complete.")
 
     except KeyboardInterrupt:
         print("\nProgram interrupted.")
     finally:
         print("\nCleaning up GPIO...")
+        buzzer.cleanup()
         GPIO.cleanup()
 
 if __name__ == "__main__":
@@ -1,9 +1,16 @@
 import RPi.GPIO as GPIO
+import os
 import time
 import json
 import sys
 import curses
 
+# orjson is optional and only speeds up reading/writing the calibration file
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # ========== CONFIGURATION ==========
 SERVO_PINS = {
     "s0": 16, "s1": 17, "s2": 18, "s3": 19,
@@ -17,14 +24,28 @@ DEFAULT_MIN_DUTY = 2.5   # Corresponds to logical -90
 DEFAULT_CENTER_DUTY = 7.5  # Corresponds to logical 0
 DEFAULT_MAX_DUTY = 12.5  # Corresponds to logical +90
 
+# Safe absolute duty range the calibration tool will drive a servo within
+SAFE_MIN_DUTY = 1.0
+SAFE_MAX_DUTY = 14.0
+# Resolution of the duty -> logical angle lookup table (steps per 1% duty)
+LUT_STEPS_PER_DUTY = 100
+
+# After this long (ms) without a key press, pulses are stopped to reduce jitter
+IDLE_STOP_DELAY_MS = 100
+
 # ========== HELPER FUNCTIONS ==========
 
 def load_or_create_calibration_data():
-    """Loads calibration data or creates a default file if it doesn't exist."""
+    """
+    Loads calibration data or creates a default file if it doesn't exist.
+    Returns (data, dirty) where dirty is True if entries were added that
+    still need to be saved.
+    """
     try:
-        with open(CALIBRATION_FILE, 'r') as f:
-            data = json.load(f)
-            # Ensure all known servos have an entry
+        with open(CALIBRATION_FILE, 'rb') as f:
+            data = orjson.loads(f.read()) if orjson else json.load(f)
+            dirty = False
+            # Ensure all known servos have an entry (written on the normal exit save)
             for servo_id in SERVO_PINS:
                 if servo_id not in data:
                     data[servo_id] = {
@@ -32,7 +53,8 @@ def load_or_create_calibration_data():
                         "center_duty": DEFAULT_CENTER_DUTY,
                         "max_duty": DEFAULT_MAX_DUTY,
                     }
-            return data
+                    dirty = True
+            return data, dirty
     except (FileNotFoundError, json.JSONDecodeError):
         print(f"'{CALIBRATION_FILE}' not found or corrupt. Creating a new default file.")
         default_data = {}
@@ -43,12 +65,18 @@ def load_or_create_calibration_data():
                 "max_duty": DEFAULT_MAX_DUTY,
             }
         save_calibration_data(default_data)
-        return default_data
+        return default_data, False
 
 def save_calibration_data(data):
-    """Saves the calibration data to the JSON file."""
-    with open(CALIBRATION_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    """Saves the calibration data to the JSON file atomically via a temp file."""
+    tmp_file = CALIBRATION_FILE + ".tmp"
+    if orjson:
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f, indent=2)
+    os.replace(tmp_file, CALIBRATION_FILE)
 
 def map_logical_to_duty(logical_angle, calib):
     """Maps a logical angle (-90 to +90) to a calibrated PWM duty cycle."""
@@ -61,6 +89,14 @@ def map_logical_to_duty(logical_angle, calib):
         # Map from [-90, 0) to [min_duty, center_duty)
         return calib['center_duty'] + (logical_angle / 90.0) * (calib['center_duty'] - calib['min_duty'])
 
+def map_logical_to_duties(logical_angles, calib):
+    """Maps a whole sequence of logical angles to duty cycles in one pass (e.g. for a trajectory)."""
+    center = calib['center_duty']
+    # Resolve the calibration spans once instead of once per angle
+    pos_scale = (calib['max_duty'] - center) / 90.0
+    neg_scale = (center - calib['min_duty']) / 90.0
+    return [center + angle * (pos_scale if angle >= 0 else neg_scale) for angle in logical_angles]
+
 def map_duty_to_logical(duty_cycle, calib):
     """Maps a duty cycle back to a logical angle for display."""
     if abs(duty_cycle - calib['center_duty']) < 0.01:
@@ -70,6 +106,33 @@ def map_duty_to_logical(duty_cycle, calib):
     else:
         return (duty_cycle - calib['center_duty']) / (calib['center_duty'] - calib['min_duty']) * 90.0
 
+def build_duty_to_logical_lut(calib):
+    """
+    Precomputes map_duty_to_logical over the safe duty range at 0.01 resolution.
+    Index with duty_to_lut_index(). Must be rebuilt whenever min/center/max change.
+    """
+    lut = []
+    for i in range(int(round((SAFE_MAX_DUTY - SAFE_MIN_DUTY) * LUT_STEPS_PER_DUTY)) + 1):
+        duty = SAFE_MIN_DUTY + i / LUT_STEPS_PER_DUTY
+        try:
+            lut.append(map_duty_to_logical(duty, calib))
+        except ZeroDivisionError:
+            # Min or max currently equals center; that side has no range yet
+            lut.append(90.0 if duty > calib['center_duty'] else -90.0)
+    return lut
+
+def duty_to_lut_index(duty_cycle):
+    """
+    Returns the index of `duty_cycle` in a table from build_duty_to_logical_lut().
+    Duties outside the safe range (e.g. a hand-edited calibration file) map to the nearest end.
+    """
+    index = int(round((duty_cycle - SAFE_MIN_DUTY) * LUT_STEPS_PER_DUTY))
+    return max(0, min(index, int(round((SAFE_MAX_DUTY - SAFE_MIN_DUTY) * LUT_STEPS_PER_DUTY))))
+
+def build_logical_to_duty_lut(calib):
+    """Precomputes the calibrated duty cycle for every whole logical angle; index with angle + 90."""
+    return map_logical_to_duties(range(-90, 91), calib)
+
 def parse_servo_selection(args):
     """Parses command-line arguments to get a list of servos to calibrate."""
     if len(args) < 2:
@@ -88,43 +151,63 @@ def parse_servo_selection(args):
             sys.exit(1)
     return selected_servos
 
-def draw_ui(stdscr, servo_id, calib, current_duty, message=""):
-    """Draws the user interface using curses."""
+# Row and label of each value field in the UI. The labels are drawn once per servo
+# by draw_static_ui(); draw_values() only rewrites the numbers after them.
+DUTY_FIELD = (3, "Current Duty Cycle: ")
+ANGLE_FIELD = (4, "Current Logical Angle: ")
+MIN_FIELD = (7, "Min    (Logical -90°): ")
+CENTER_FIELD = (8, "Center (Logical   0°): ")
+MAX_FIELD = (9, "Max    (Logical +90°): ")
+
+def draw_static_ui(stdscr, servo_id):
+    """Draws the parts of the interface that do not change while calibrating a servo."""
     stdscr.clear()
     h, w = stdscr.getmaxyx()
     
-    logical_angle = map_duty_to_logical(current_duty, calib)
-    
     title = f"--- Ninja Servo Calibration (Calibrating: {servo_id}) ---"
     stdscr.addstr(0, (w - len(title)) // 2, title)
     
     stdscr.addstr(2, 1, f"GPIO Pin: {SERVO_PINS[servo_id]}")
-    stdscr.addstr(3, 1, f"Current Duty Cycle: {current_duty:.2f}")
-    stdscr.addstr(4, 1, f"Current Logical Angle: {logical_angle:.1f}°")
-    
     stdscr.addstr(6, 1, "--- Calibration Values (Duty Cycle) ---")
-    stdscr.addstr(7, 1, f"Min    (Logical -90°): {calib['min_duty']:.2f}")
-    stdscr.addstr(8, 1, f"Center (Logical   0°): {calib['center_duty']:.2f}")
-    stdscr.addstr(9, 1, f"Max    (Logical +90°): {calib['max_duty']:.2f}")
+    for row, label in (DUTY_FIELD, ANGLE_FIELD, MIN_FIELD, CENTER_FIELD, MAX_FIELD):
+        stdscr.addstr(row, 1, label)
     
     stdscr.addstr(11, 1, "--- Controls ---")
     stdscr.addstr(12, 1, "[w/s] Hold to adjust angle | [x/c/v] Go to Min/Center/Max")
     stdscr.addstr(13, 1, "[X/C/V] Set Min/Center/Max | [n] Next Servo | [q] Quit & Save")
+
+def _draw_field(stdscr, field, text):
+    row, label = field
+    stdscr.addstr(row, 1 + len(label), text)
+    stdscr.clrtoeol()
+
+def draw_values(stdscr, calib, duty_lut, current_duty, message=""):
+    """Updates the value fields and message line drawn over draw_static_ui()."""
+    h, w = stdscr.getmaxyx()
+    
+    logical_angle = duty_lut[duty_to_lut_index(current_duty)]
     
+    _draw_field(stdscr, DUTY_FIELD, f"{current_duty:.2f}")
+    _draw_field(stdscr, ANGLE_FIELD, f"{logical_angle:.1f}°")
+    _draw_field(stdscr, MIN_FIELD, f"{calib['min_duty']:.2f}")
+    _draw_field(stdscr, CENTER_FIELD, f"{calib['center_duty']:.2f}")
+    _draw_field(stdscr, MAX_FIELD, f"{calib['max_duty']:.2f}")
+    
+    stdscr.move(h - 2, 1)
+    stdscr.clrtoeol()
     if message:
         stdscr.addstr(h - 2, 1, message)
         
+    # No clear(): curses only sends the cells that actually changed
     stdscr.refresh()
 
 def main(stdscr, servos_to_calibrate):
     """Main application logic, wrapped by curses."""
     # Curses setup
     curses.curs_set(0)  # Hide cursor
-    stdscr.nodelay(1)   # Make getch() non-blocking
-    stdscr.timeout(100) # Timeout for getch() in ms
 
     # Load calibration data
-    all_calib_data = load_or_create_calibration_data()
+    all_calib_data, dirty = load_or_create_calibration_data()
 
     # Initialize all servos and move to center
     pwm_objects = {}
@@ -147,19 +230,27 @@ def main(stdscr, servos_to_calibrate):
         active_pwm = pwm_objects[servo_id]
         calib = all_calib_data[servo_id]
         current_duty = calib['center_duty']
+        duty_lut = build_duty_to_logical_lut(calib)
+        pulsing = False
         
         message = f"Starting calibration for {servo_id}. Press 'n' for next, 'q' to quit."
+        draw_static_ui(stdscr, servo_id)
 
         # Calibration loop for the current servo
         while True:
-            draw_ui(stdscr, servo_id, calib, current_duty, message)
+            draw_values(stdscr, calib, duty_lut, current_duty, message)
             message = "" # Clear message after one display
 
+            # Block until a key arrives. While the servo is being driven, wake up
+            # once after a short idle period to stop the pulses; otherwise sleep
+            # until the next key instead of polling.
+            stdscr.timeout(IDLE_STOP_DELAY_MS if pulsing else -1)
             key = stdscr.getch()
 
             if key == ord('q'):
-                # Save and exit entire program
-                save_calibration_data(all_calib_data)
+                # Save (if anything changed) and exit entire program
+                if dirty:
+                    save_calibration_data(all_calib_data)
                 return
             elif key == ord('n'):
                 # Move to the next servo in the list
@@ -187,16 +278,23 @@ def main(stdscr, servos_to_calibrate):
                 calib['max_duty'] = round(current_duty, 2)
                 message = f"Set {servo_id} MAX to {current_duty:.2f}"
 
+            if key in (ord('X'), ord('C'), ord('V')):
+                duty_lut = build_duty_to_logical_lut(calib)
+                dirty = True
+
             # Apply the new duty cycle
             if key != -1: # A key was pressed or held
                 # Clamp the duty cycle to a safe absolute range
-                current_duty = max(1.0, min(14.0, current_duty))
+                current_duty = max(SAFE_MIN_DUTY, min(SAFE_MAX_DUTY, current_duty))
                 active_pwm.ChangeDutyCycle(current_duty)
-            else: # No key pressed, stop pulse to reduce jitter
+                pulsing = True
+            else: # Idle timeout expired, stop pulse to reduce jitter
                 active_pwm.ChangeDutyCycle(0)
+                pulsing = False
 
     # After loop finishes
-    save_calibration_data(all_calib_data)
+    if dirty:
+        save_calibration_data(all_calib_data)
     stdscr.addstr(curses.LINES - 1, 0, "All selected servos calibrated. Exiting...")
     stdscr.refresh()
     time.sleep(2)
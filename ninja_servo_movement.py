@@ -1,151 +1,558 @@
 import RPi.GPIO as GPIO
+import os
 import time
 import json
 import sys
 import threading
+import queue
+import re
+import selectors
+import collections
+
+# pigpio is optional: when its daemon (pigpiod) is running, servo pulses are
+# generated by the Pi's DMA hardware instead of RPi.GPIO's software PWM thread.
+try:
+    import pigpio
+except ImportError:
+    pigpio = None
 
 # ========== CONFIGURATION ==========
 CALIBRATION_FILE = "servo_calibration.json"
 PWM_FREQ = 50
+PWM_PERIOD = 1.0 / PWM_FREQ
+PWM_PERIOD_US = 1000000 // PWM_FREQ
 MIN_MOVE_DELAY = 0.04
 MAX_MOVE_DELAY = 0.002
+# SCHED_FIFO priority for servo threads (only applied when running as root)
+SERVO_RT_PRIORITY = 80
+# Longest time (s) a servo in a parallel command waits for the others to be ready
+START_BARRIER_TIMEOUT = 1.0
+# Ramp steps sleep until this close (ns) to their deadline, then busy-wait the rest
+SPIN_SLACK_NS = 200000
+# How often (s) the REPL checks for typed-ahead input while a command runs
+INPUT_POLL_INTERVAL = 0.01
+# Kernel hardware PWM for the servos on GPIO18/19. Opt-in: set to True only once
+# dtoverlay=pwm-2chan routes those pins to the PWM channels (see readme), since
+# the kernel cannot tell us which pin a channel is actually wired to.
+USE_SYSFS_PWM = False
+SYSFS_PWM_CHIP = "/sys/class/pwm/pwmchip0"
+# GPIO pin -> pwmchip0 channel, as routed by the readme's overlay line
+SYSFS_PWM_CHANNELS = {18: 0, 19: 1}
+
+# ========== PWM BACKENDS ==========
+# A backend drives one servo pin. set_pulse_us() takes the pulse width in whole
+# microseconds; 0 stops the pulses. The calibration file stores duty cycles in
+# percent, which duty_to_us() converts once when a servo is set up.
+
+def duty_to_us(duty):
+    """Converts a duty cycle in percent to a pulse width in whole microseconds."""
+    return int(round(duty * PWM_PERIOD_US / 100))
+
+class RPiGPIOBackend:
+    """Software PWM from RPi.GPIO. Always available, but timed by a Python thread."""
+
+    def __init__(self, pin):
+        self.pin = pin
+        GPIO.setup(self.pin, GPIO.OUT)
+        self.pwm = GPIO.PWM(self.pin, PWM_FREQ)
+        self.pwm.start(0)
+
+    def set_pulse_us(self, pulse_us):
+        self.pwm.ChangeDutyCycle(pulse_us * 100.0 / PWM_PERIOD_US)
+
+    def stop(self):
+        self.pwm.stop()
+
+class PigpioBackend:
+    """DMA-timed PWM from the pigpio daemon, independent of Python scheduling."""
+
+    def __init__(self, pi, pin):
+        self.pi = pi
+        self.pin = pin
+        self.pi.set_mode(self.pin, pigpio.OUTPUT)
+        self.pi.set_PWM_frequency(self.pin, PWM_FREQ)
+        # A range of one PWM period lets the duty be given directly in microseconds.
+        # (set_servo_pulsewidth would reject calibrations below 500 us.)
+        self.pi.set_PWM_range(self.pin, PWM_PERIOD_US)
+        self.pi.set_PWM_dutycycle(self.pin, 0)
+
+    def set_pulse_us(self, pulse_us):
+        self.pi.set_PWM_dutycycle(self.pin, pulse_us)
+
+    def stop(self):
+        self.pi.set_PWM_dutycycle(self.pin, 0)
+
+class SysfsPWMBackend:
+    """
+    Hardware PWM through the kernel's sysfs interface: each update is a single
+    os.pwrite() to an fd kept open, with no Python library in between.
+    Raises OSError if the PWM channel is not available.
+    """
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.channel = SYSFS_PWM_CHANNELS[pin]
+        self.channel_dir = f"{SYSFS_PWM_CHIP}/pwm{self.channel}"
+        exported = False
+        if not os.path.isdir(self.channel_dir):
+            self._write_chip_attr("export", self.channel)
+            exported = True
+        self._duty_fd = None
+        try:
+            self._write_attr("period", PWM_PERIOD_US * 1000)
+            self._duty_fd = os.open(f"{self.channel_dir}/duty_cycle", os.O_WRONLY)
+            # Pulse width (us) -> ASCII nanoseconds, filled as widths are first used
+            self._duty_bytes = {}
+            os.pwrite(self._duty_fd, b"0", 0)
+            self._write_attr("enable", 1)
+        except OSError:
+            # Leave the channel as we found it before the caller falls back
+            if self._duty_fd is not None:
+                os.close(self._duty_fd)
+            if exported:
+                try:
+                    self._write_chip_attr("unexport", self.channel)
+                except OSError:
+                    pass
+            raise
+
+    @staticmethod
+    def _write_chip_attr(name, value):
+        with open(f"{SYSFS_PWM_CHIP}/{name}", 'w') as f:
+            f.write(str(value))
 
-# ========== SERVO CONTROLLER CLASS (Unchanged) ==========
+    def _write_attr(self, name, value):
+        with open(f"{self.channel_dir}/{name}", 'w') as f:
+            f.write(str(value))
+
+    def set_pulse_us(self, pulse_us):
+        data = self._duty_bytes.get(pulse_us)
+        if data is None:
+            data = self._duty_bytes[pulse_us] = str(pulse_us * 1000).encode()
+        os.pwrite(self._duty_fd, data, 0)
+
+    def stop(self):
+        os.pwrite(self._duty_fd, b"0", 0)
+        self._write_attr("enable", 0)
+        os.close(self._duty_fd)
+
+def connect_pigpio():
+    """Returns a connected pigpio.pi, or None if pigpio or its daemon is unavailable."""
+    if pigpio is None:
+        return None
+    pi = pigpio.pi()
+    if not pi.connected:
+        return None
+    return pi
+
+def make_backend(pin, pi=None):
+    """Creates the best available backend for `pin`; `pi` is a pigpio connection or None."""
+    if USE_SYSFS_PWM and pin in SYSFS_PWM_CHANNELS:
+        try:
+            return SysfsPWMBackend(pin)
+        except OSError:
+            pass
+    if pi is not None:
+        return PigpioBackend(pi, pin)
+    return RPiGPIOBackend(pin)
+
+def make_thread_realtime(cpu=None):
+    """
+    Best effort: moves the calling thread to SCHED_FIFO and pins it to `cpu`.
+    Without root (or on non-Linux systems) the thread keeps default scheduling.
+    Returns True if the thread got real-time scheduling.
+    """
+    tid = threading.get_native_id()
+    try:
+        os.sched_setscheduler(tid, os.SCHED_FIFO, os.sched_param(SERVO_RT_PRIORITY))
+        realtime = True
+    except (AttributeError, OSError):
+        realtime = False
+    if cpu is not None:
+        try:
+            os.sched_setaffinity(tid, {cpu})
+        except (AttributeError, OSError):
+            pass
+    return realtime
+
+def plan_ramp(pulse_change_us, speed):
+    """
+    Returns (steps, step_delay) for ramping the pulse width by `pulse_change_us` at
+    `speed` (0.0-1.0). steps is 0 when the change is too small to move.
+    """
+    duty_change = pulse_change_us * 100.0 / PWM_PERIOD_US
+    steps = int(abs(duty_change) / 0.1)
+    if steps == 0:
+        return 0, 0.0
+    move_delay = MIN_MOVE_DELAY - (speed * (MIN_MOVE_DELAY - MAX_MOVE_DELAY))
+    # The PWM hardware emits one pulse per period, so the servo never sees
+    # more than one duty update per period. Fast ramps are resampled to one
+    # step per period, letting the PWM timer pace them with the same total time;
+    # this is the only place steps get coarser than 0.1% duty.
+    if move_delay < PWM_PERIOD:
+        ramp_time = steps * move_delay
+        steps = max(1, int(ramp_time / PWM_PERIOD))
+        move_delay = ramp_time / steps
+    return steps, move_delay
+
+def wait_until_ns(deadline_ns, spin_ns=SPIN_SLACK_NS):
+    """
+    Waits until time.monotonic_ns() reaches `deadline_ns`. Ramp steps are paced
+    against absolute deadlines so sleep overshoot does not accumulate; the last
+    `spin_ns` is busy-waited, with sleep(0) releasing the GIL for other threads.
+    """
+    remaining = deadline_ns - time.monotonic_ns()
+    if remaining > spin_ns:
+        time.sleep((remaining - spin_ns) / 1e9)
+    while time.monotonic_ns() < deadline_ns:
+        time.sleep(0)
+
+def run_ramp(set_pulse_us, ramp, step_ns, is_stopped, spin_ns=SPIN_SLACK_NS):
+    """
+    The hot loop of every move: writes each pulse width of `ramp` through
+    `set_pulse_us`, one every `step_ns`, until done or `is_stopped()` returns True.
+    Returns how many pulse widths were written.
+    Kept free of object state so it has a single, narrow call boundary.
+    """
+    # wait_until_ns() is inlined and all lookups are locals: this runs per step
+    sleep = time.sleep
+    now_ns = time.monotonic_ns
+    written = 0
+    next_t = now_ns()
+    for pulse_us in ramp:
+        if is_stopped():
+            break
+        set_pulse_us(pulse_us)
+        written += 1
+        next_t += step_ns
+        remaining = next_t - now_ns()
+        if remaining > spin_ns:
+            sleep((remaining - spin_ns) / 1e9)
+        while now_ns() < next_t:
+            sleep(0)
+    return written
+
+# ========== SERVO CONTROLLER CLASS ==========
 
 class ServoController:
     """Manages an individual servo motor, including its state and movement thread."""
 
-    def __init__(self, servo_id, pin, calib_data):
+    # Fixed attribute layout: no per-instance __dict__, and cheaper attribute access
+    __slots__ = (
+        'servo_id', 'pin', 'calib_data', 'cpu', 'backend',
+        '_center_us', '_named_us', '_pos_scale', '_neg_scale',
+        'current_us', 'stop_event', 'done_event', 'start_barrier',
+        '_spin_ns', '_inbox', '_worker',
+    )
+
+    def __init__(self, servo_id, pin, calib_data, backend=None, cpu=None):
         self.servo_id = servo_id
         self.pin = pin
         self.calib_data = calib_data
+        self.cpu = cpu  # CPU core the movement thread is pinned to, if any
         
-        GPIO.setup(self.pin, GPIO.OUT)
-        self.pwm = GPIO.PWM(self.pin, PWM_FREQ)
-        self.pwm.start(0)
+        self.backend = backend if backend is not None else RPiGPIOBackend(self.pin)
         
-        self.current_duty = self.calib_data['center_duty']
-        self.thread = None
+        # Calibration resolved once into whole microseconds for _map_logical_to_us;
+        # pulse widths are only meaningful to the servo at that resolution.
+        self._center_us = duty_to_us(self.calib_data['center_duty'])
+        max_us = duty_to_us(self.calib_data['max_duty'])
+        min_us = duty_to_us(self.calib_data['min_duty'])
+        self._named_us = {'M': max_us, 'C': self._center_us, 'N': min_us}
+        self._pos_scale = (max_us - self._center_us) / 90.0
+        self._neg_scale = (self._center_us - min_us) / 90.0
+
+        self.current_us = self._center_us
+        # Cancellation and completion flags of the current command. A fresh pair is
+        # made per command; both start set, meaning "nothing running".
         self.stop_event = threading.Event()
+        self.stop_event.set()
+        self.done_event = threading.Event()
+        self.done_event.set()
+        # Barrier the current command starts behind, if it is part of a parallel command
+        self.start_barrier = None
+        # Busy-wait tail of each ramp step; the worker drops it once it runs real-time
+        self._spin_ns = SPIN_SLACK_NS
+
+        # One long-lived worker per servo runs the commands handed to it through
+        # the inbox, so commands don't pay for thread creation and the worker's
+        # real-time scheduling settings persist.
+        self._inbox = queue.Queue()
+        self._worker = threading.Thread(target=self._worker_loop)
+        self._worker.daemon = True
+        self._worker.start()
 
-    def _map_logical_to_duty(self, angle_str):
-        angle_str = str(angle_str).upper()
-        if angle_str == 'M': return self.calib_data['max_duty']
-        if angle_str == 'C': return self.calib_data['center_duty']
-        if angle_str == 'N': return self.calib_data['min_duty']
+    def _map_logical_to_us(self, angle_str):
+        angle_str = str(angle_str).strip().upper()
+        named_us = self._named_us.get(angle_str)
+        if named_us is not None:
+            return named_us
         try:
             logical_angle = float(angle_str)
             logical_angle = max(-90.0, min(90.0, logical_angle))
             if logical_angle >= 0:
-                return self.calib_data['center_duty'] + (logical_angle / 90.0) * (self.calib_data['max_duty'] - self.calib_data['center_duty'])
+                return self._center_us + int(round(logical_angle * self._pos_scale))
             else:
-                return self.calib_data['center_duty'] + (logical_angle / 90.0) * (self.calib_data['center_duty'] - self.calib_data['min_duty'])
+                return self._center_us + int(round(logical_angle * self._neg_scale))
         except ValueError:
             print(f"Warning: Invalid angle '{angle_str}' for servo {self.servo_id}. Using center.")
-            return self.calib_data['center_duty']
+            return self._center_us
 
-    def _move_to_duty(self, target_duty, speed):
-        start_duty = self.current_duty
-        steps = int(abs(target_duty - start_duty) / 0.1)
+    @staticmethod
+    def _plan_move(start_us, target_us, speed):
+        """
+        Builds the ramp from `start_us` to `target_us`, in integer microseconds.
+        Returns (ramp, step_ns); the ramp is empty when there is nothing to move.
+        """
+        change_us = target_us - start_us
+        steps, move_delay = plan_ramp(change_us, speed)
         if steps == 0:
-            self.pwm.ChangeDutyCycle(0)
-            return
-        move_delay = MIN_MOVE_DELAY - (speed * (MIN_MOVE_DELAY - MAX_MOVE_DELAY))
-        for i in range(steps + 1):
-            if self.stop_event.is_set(): return
-            duty = start_duty + (target_duty - start_duty) * (i / steps)
-            self.pwm.ChangeDutyCycle(duty)
-            time.sleep(move_delay)
-        self.current_duty = target_duty
-        self.pwm.ChangeDutyCycle(0)
-
-    def _run_sequence_thread(self, angles, loop_count, speed):
+            # Already there: leave the pulses alone, dropping them would make it twitch
+            return [], 0
+        return [start_us + change_us * i // steps for i in range(steps + 1)], int(move_delay * 1e9)
+
+    def _move(self, ramp, step_ns, is_stopped):
+        written = run_ramp(self.backend.set_pulse_us, ramp, step_ns, is_stopped, self._spin_ns)
+        # Remember where the servo was left so the next move starts there.
+        # Pulses keep running between the moves of a sequence so the servo holds
+        # torque; they are released once the whole sequence is done.
+        if written:
+            self.current_us = ramp[written - 1]
+
+    def _worker_loop(self):
+        if make_thread_realtime(self.cpu):
+            # A SCHED_FIFO thread wakes on time from a plain sleep, so it skips the
+            # spin and doesn't trade the GIL back and forth with the other servos.
+            self._spin_ns = 0
+        while True:
+            command = self._inbox.get()
+            if command is None:
+                return
+            # Each command carries its own events, so a late-finishing command can
+            # never pick up the stop flag of the one queued after it.
+            pulses_us, loop_count, speed, stop_event, done_event, start_barrier = command
+            try:
+                if start_barrier is not None:
+                    # Parallel commands: start moving together with the other servos
+                    try:
+                        start_barrier.wait(START_BARRIER_TIMEOUT)
+                    except threading.BrokenBarrierError:
+                        pass
+                self._run_sequence(pulses_us, loop_count, speed, stop_event)
+                self._release()
+            finally:
+                done_event.set()
+
+    def _run_sequence(self, pulses_us, loop_count, speed, stop_event):
+        # Every loop repeats the same moves, so each (start, target) ramp is built
+        # once per sequence and replayed from here on later loops.
+        is_stopped = stop_event.is_set
+        moves = {}
         loops = 0
-        while not self.stop_event.is_set() and (loop_count == 0 or loops < loop_count):
-            for angle_str in angles:
-                if self.stop_event.is_set(): break
-                target_duty = self._map_logical_to_duty(angle_str)
-                self._move_to_duty(target_duty, speed)
+        while not is_stopped() and (loop_count == 0 or loops < loop_count):
+            for target_us in pulses_us:
+                if is_stopped(): break
+                key = (self.current_us, target_us)
+                move = moves.get(key)
+                if move is None:
+                    move = moves[key] = self._plan_move(self.current_us, target_us, speed)
+                self._move(*move, is_stopped)
             loops += 1
 
-    def start_sequence(self, angles, loop_count, speed):
+    def start_sequence(self, angles, loop_count, speed, start_barrier=None):
+        # Angles are parsed once here, so looping sequences never re-parse strings
+        pulses_us = [self._map_logical_to_us(angle_str) for angle_str in angles]
+        if (start_barrier is None and self.done_event.is_set()
+                and all(pulse_us == self.current_us for pulse_us in pulses_us)):
+            # Idle and every target is where the servo already is: nothing to move
+            return
         self.stop()
-        self.stop_event.clear()
-        self.thread = threading.Thread(target=self._run_sequence_thread, args=(angles, loop_count, speed))
-        self.thread.daemon = True
-        self.thread.start()
+        self.stop_event = threading.Event()
+        self.done_event = threading.Event()
+        self.start_barrier = start_barrier
+        self._inbox.put((pulses_us, loop_count, speed, self.stop_event, self.done_event, start_barrier))
 
-    def stop(self):
-        if self.thread and self.thread.is_alive():
+    def wait(self, timeout=None):
+        """Blocks until the current command has finished (or was stopped)."""
+        return self.done_event.wait(timeout)
+
+    def _release(self):
+        """Stops the pulses so an idle servo doesn't jitter."""
+        self.backend.set_pulse_us(0)
+
+    def request_stop(self):
+        """Asks the current command to stop without waiting for it."""
+        if not self.done_event.is_set():
             self.stop_event.set()
-            self.thread.join(timeout=0.5)
-        self.pwm.ChangeDutyCycle(0)
+            if self.start_barrier is not None:
+                # Don't leave the worker waiting for servos that may never arrive
+                self.start_barrier.abort()
+
+    def stop(self):
+        self.request_stop()
+        if not self.done_event.is_set():
+            self.done_event.wait(timeout=0.5)
+        self._release()
 
     def center(self, speed=0.5):
         self.start_sequence(['C'], 1, speed)
 
     def cleanup(self):
         self.stop()
-        self.pwm.stop()
+        self._inbox.put(None)
+        self._worker.join(timeout=0.5)
+        self.backend.stop()
 
 # ========== NEW PARSING AND MAIN LOGIC ==========
 
+# Whole command grammar in one compiled regex. L and S may come in either order;
+# if one is repeated, the last value wins.
+COMMAND_RE = re.compile(
+    r'^\s*(?P<servo_id>s\d+)\s*:(?P<angles>[^;]+)'
+    r'(?:;\s*(?:L(?P<loops>\d+)|S(?P<speed>-?(?:\d+(?:\.\d*)?|\.\d+)))\s*)*;?\s*$',
+    re.IGNORECASE)
+
 def parse_command(command_str):
     """
     Parses a flexible command string into its components.
     Format: s{ID}:angles[,angles...][;L{loops}][;S{speed}]
     Returns a dictionary with parsed values or None if format is invalid.
     """
-    try:
-        servo_id, payload = command_str.split(':', 1)
-    except ValueError:
-        return None # Invalid format, missing ':'
+    match = COMMAND_RE.match(command_str)
+    if match is None:
+        return None
 
-    # Set defaults
-    loop_count = 1
+    loop_count = int(match['loops']) if match['loops'] else 1
     speed = 0.5
-    
-    parts = payload.split(';')
-    angles = parts[0].split(',')
-
-    # Parse optional parameters (L and S)
-    for part in parts[1:]:
-        part = part.strip().upper()
-        if not part: continue
+    if match['speed']:
+        speed = float(match['speed'])
+        if not (0.0 <= speed <= 1.0):
+            print(f"Warning: Speed 'S{match['speed']}' out of range (0.0-1.0). Clamping.")
+            speed = max(0.0, min(1.0, speed))
 
-        if part.startswith('L'):
-            try:
-                loop_count = int(part[1:])
-            except ValueError:
-                print(f"Warning: Invalid loop format '{part}'. Using default L1.")
-        elif part.startswith('S'):
-            try:
-                speed = float(part[1:])
-                if not (0.0 <= speed <= 1.0):
-                    print(f"Warning: Speed '{part}' out of range (0.0-1.0). Clamping.")
-                    speed = max(0.0, min(1.0, speed))
-            except ValueError:
-                print(f"Warning: Invalid speed format '{part}'. Using default S0.5.")
-        else:
-            print(f"Warning: Unknown parameter '{part}'. Ignoring.")
-            
     return {
-        "servo_id": servo_id,
-        "angles": angles,
+        "servo_id": match['servo_id'].lower(),
+        "angles": match['angles'].split(','),
         "loop_count": loop_count,
         "speed": speed
     }
 
+def parse_user_input(user_input, controllers):
+    """
+    Parses one input line of servo commands ("cmd1 | cmd2 ...") into a dict of
+    servo_id -> parsed command, printing errors for invalid parts.
+    Returns None for the REPL keywords (empty line, quit, help, reset).
+    """
+    if not user_input or user_input.lower() in ['quit', 'q', 'exit', 'help', 'reset']:
+        return None
+
+    # Parse and validate everything first so all servos can be started together.
+    # If a servo is listed twice, the last command for it wins.
+    parsed_commands = {}
+    commands = [cmd.strip() for cmd in user_input.split('|')]
+    for command in commands:
+        # Use the new flexible parser
+        parsed_data = parse_command(command)
+
+        if parsed_data is None:
+            print(f"Error: Invalid command format for '{command}'. Type 'help'.")
+            continue
+
+        servo_id = parsed_data["servo_id"]
+        if servo_id not in controllers:
+            print(f"Error: Unknown servo ID '{servo_id}'")
+            continue
+
+        parsed_commands[servo_id] = parsed_data
+    return parsed_commands
+
+class CommandReader:
+    """
+    Reads stdin lines through a selector instead of input(), so lines typed
+    ahead while a command runs can be read and parsed before it finishes.
+    """
+
+    def __init__(self, stream=sys.stdin):
+        self.fd = stream.fileno()
+        self.selector = selectors.DefaultSelector()
+        try:
+            self.selector.register(self.fd, selectors.EVENT_READ)
+        except OSError:
+            # epoll refuses regular files (stdin redirected from a script); a
+            # regular file never blocks, so it is simply treated as always ready.
+            self.selector.close()
+            self.selector = None
+        self.lines = collections.deque()
+        self.eof = False
+        self._partial = b''
+
+    def poll(self, timeout=None):
+        """Reads input that becomes ready within `timeout` s (None blocks); returns True if lines are queued."""
+        if not self.eof and (self.selector is None or self.selector.select(timeout)):
+            data = os.read(self.fd, 4096)
+            if data:
+                *complete, self._partial = (self._partial + data).split(b'\n')
+            else:
+                self.eof = True
+                complete = [self._partial] if self._partial else []
+            self.lines.extend(line.decode('utf-8', 'replace').strip() for line in complete)
+        return bool(self.lines)
+
+    def readline(self):
+        """Blocks until a full line is available; returns None at end of input."""
+        while not self.lines:
+            if self.eof:
+                return None
+            self.poll()
+        return self.lines.popleft()
+
+    def close(self):
+        if self.selector is not None:
+            self.selector.close()
+
+def move_servos_together(targets, speed):
+    """
+    Ramps several idle servos to their target pulse widths in lock-step from the
+    calling thread: every tick updates all pins back to back, so there is no skew
+    between servos. `targets` maps ServoController -> target pulse width (us).
+    Pulses are released at the end.
+    """
+    controllers = list(targets)
+    starts = [controller.current_us for controller in controllers]
+    ends = [targets[controller] for controller in controllers]
+    # The largest move sets the pace; smaller moves are stretched to finish with it
+    steps, move_delay = plan_ramp(max(abs(end - start) for start, end in zip(starts, ends)), speed)
+    if steps > 0:
+        setters = [controller.backend.set_pulse_us for controller in controllers]
+        # One ramp column per servo, transposed into one frame of pulse widths per
+        # tick, so the timed loop only fans the precomputed values out to the pins.
+        ramps = []
+        for start, end in zip(starts, ends):
+            ramps.append([start + (end - start) * i // steps for i in range(steps + 1)])
+        frames = list(zip(*ramps))
+        step_ns = int(move_delay * 1e9)
+        next_t = time.monotonic_ns()
+        for frame in frames:
+            for set_pulse_us, pulse_us in zip(setters, frame):
+                set_pulse_us(pulse_us)
+            next_t += step_ns
+            wait_until_ns(next_t)
+    for controller, end in zip(controllers, ends):
+        controller.current_us = end
+        controller.stop()
+
+def stop_all_servos(controllers):
+    """Stops every servo, signalling them all first so their wind-downs overlap."""
+    for controller in controllers.values():
+        controller.request_stop()
+    for controller in controllers.values():
+        controller.stop()
+
 def reset_all_servos(controllers):
     """Stops all movements and smoothly moves all servos to their calibrated center positions."""
     print("Resetting all servos to their calibrated center positions...")
-    threads = []
-    for controller in controllers.values():
-        controller.center(speed=0.7) 
-        if controller.thread:
-            threads.append(controller.thread)
-    for t in threads:
-        t.join()
+    stop_all_servos(controllers)
+    move_servos_together({controller: duty_to_us(controller.calib_data['center_duty']) for controller in controllers.values()}, speed=0.7)
     print("Reset complete.")
 
 def main():
@@ -161,18 +568,39 @@ def main():
     GPIO.setmode(GPIO.BCM)
     
     servo_pins = {"s0": 16, "s1": 17, "s2": 18, "s3": 19}
-    controllers = {sid: ServoController(sid, pin, all_calib_data[sid]) for sid, pin in servo_pins.items() if sid in all_calib_data}
+    pi = connect_pigpio()
+    print(f"Using {'pigpio (DMA-timed)' if pi else 'RPi.GPIO (software)'} PWM.")
+    # Spread the servo threads over the CPU cores, leaving the first core to this REPL
+    cpus = sorted(os.sched_getaffinity(0))
+    servo_cpus = cpus[1:] or cpus
+    controllers = {}
+    for index, (sid, pin) in enumerate(servo_pins.items()):
+        if sid in all_calib_data:
+            cpu = servo_cpus[index % len(servo_cpus)]
+            backend = make_backend(pin, pi)
+            if isinstance(backend, SysfsPWMBackend):
+                print(f"  {sid} (GPIO{pin}): kernel hardware PWM")
+            controllers[sid] = ServoController(sid, pin, all_calib_data[sid], backend, cpu)
         
     reset_all_servos(controllers)
     print("\nReady for commands. Type 'help' for instructions or 'quit' to exit.")
 
+    reader = None
+    # Lines typed ahead, already parsed: (user_input, parsed_commands)
+    pending = collections.deque()
     try:
+        reader = CommandReader()
         while True:
-            user_input = input("> ").strip()
-            
+            if not pending:
+                print("> ", end="", flush=True)
+                user_input = reader.readline()
+                if user_input is None:
+                    break
+                pending.append((user_input, parse_user_input(user_input, controllers)))
+            user_input, parsed_commands = pending.popleft()
+
             if not user_input:
-                for controller in controllers.values():
-                    controller.stop()
+                stop_all_servos(controllers)
                 print("All movements stopped.")
                 continue
 
@@ -201,38 +629,38 @@ def main():
                 reset_all_servos(controllers)
                 continue
 
-            finite_threads = []
+            finite_controllers = []
             has_infinite_loop = False
 
-            commands = [cmd.strip() for cmd in user_input.split('|')]
-            for command in commands:
-                # Use the new flexible parser
-                parsed_data = parse_command(command)
-                
-                if parsed_data is None:
-                    print(f"Error: Invalid command format for '{command}'. Type 'help'.")
-                    continue
-
-                servo_id = parsed_data["servo_id"]
-                if servo_id not in controllers:
-                    print(f"Error: Unknown servo ID '{servo_id}'")
-                    continue
-                
+            start_barrier = None
+            if len(parsed_commands) > 1:
+                start_barrier = threading.Barrier(len(parsed_commands))
+
+            for servo_id, parsed_data in parsed_commands.items():
                 controllers[servo_id].start_sequence(
                     parsed_data["angles"],
                     parsed_data["loop_count"],
-                    parsed_data["speed"]
+                    parsed_data["speed"],
+                    start_barrier
                 )
                 
                 if parsed_data["loop_count"] != 0:
-                    finite_threads.append(controllers[servo_id].thread)
+                    finite_controllers.append(controllers[servo_id])
                 else:
                     has_infinite_loop = True
             
-            if finite_threads:
+            if finite_controllers:
                 print("Executing command(s)... (waiting for completion)")
-                for t in finite_threads:
-                    t.join()
+                for controller in finite_controllers:
+                    # Parse whatever is typed meanwhile, ready to run once this finishes
+                    while not controller.wait(0):
+                        if reader.eof:
+                            # Nothing more can arrive; poll() would return at once
+                            controller.wait()
+                        elif reader.poll(INPUT_POLL_INTERVAL):
+                            while reader.lines:
+                                line = reader.lines.popleft()
+                                pending.append((line, parse_user_input(line, controllers)))
                 
                 if not has_infinite_loop:
                     print("Command sequence complete.")
@@ -241,9 +669,13 @@ def main():
                     print("Finite movements complete. Infinite loops are still running.")
 
     finally:
+        if reader is not None:
+            reader.close()
         print("\nExiting. Cleaning up GPIO...")
         for controller in controllers.values():
             controller.cleanup()
+        if pi is not None:
+            pi.stop()
         GPIO.cleanup()
         print("Done.")
 